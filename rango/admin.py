@@ -1,11 +1,191 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, SEARCH_VAR
+from django.core.paginator import InvalidPage, Paginator
+from django.db import transaction
+from django.shortcuts import render
 from rango.models import Category, Page, UserProfile
 
+# Rows updated per transaction by the bulk actions, so each write holds the
+# database lock only briefly.
+BULK_BATCH_SIZE = 1000
+
+# Rows a change list counts before it stops and reports "at least this many".
+COUNT_LIMIT = 10000
+
+def capped_count( queryset ):
+	"""
+	Counts the rows of 'queryset' up to COUNT_LIMIT by fetching at most that
+	many primary keys, instead of running COUNT(*) over the whole table.
+	"""
+	return len( queryset.order_by().values_list( 'pk', flat=True )[:COUNT_LIMIT] )
+
+class CappedCountPaginator( Paginator ):
+	"""
+	Paginates over at most COUNT_LIMIT rows, so every page it offers is full
+	and counting never costs more than COUNT_LIMIT rows.
+	"""
+	def _get_count( self ):
+		if self._count is None:
+			self._count = capped_count( self.object_list )
+		return self._count
+	count = property( _get_count )
+
+class CappedCountChangeList( ChangeList ):
+	"""
+	Django's ChangeList also counts the whole unfiltered table with COUNT(*)
+	whenever a filter or search is active; this one caps that count too.
+	"""
+	def get_results( self, request ):
+		paginator = self.model_admin.get_paginator( request, self.queryset, self.list_per_page )
+		result_count = paginator.count
+
+		if self.get_filters_params() or self.params.get( SEARCH_VAR ):
+			full_result_count = capped_count( self.root_queryset )
+		else:
+			full_result_count = result_count
+		can_show_all = result_count <= self.list_max_show_all
+		multi_page = result_count > self.list_per_page
+
+		if ( self.show_all and can_show_all ) or not multi_page:
+			result_list = self.queryset._clone()
+		else:
+			try:
+				result_list = paginator.page( self.page_num + 1 ).object_list
+			except InvalidPage:
+				raise IncorrectLookupParameters
+
+		self.result_count = result_count
+		self.full_result_count = full_result_count
+		# Rows past the cap can only be reached by narrowing the list.
+		self.count_capped = result_count >= COUNT_LIMIT
+		self.result_list = result_list
+		self.can_show_all = can_show_all
+		self.multi_page = multi_page
+		self.paginator = paginator
+
+def prefix_search( queryset, field, search_term ):
+	"""
+	Matches rows whose 'field' starts with 'search_term', case-sensitively,
+	written as a range so SQLite can serve it from the index on 'field'.
+	(istartswith compiles to a case-insensitive LIKE, which cannot use it.)
+	"""
+	search_term = search_term.strip()
+	if not search_term:
+		return queryset
+	return queryset.filter( **{ field + '__gte': search_term,
+		field + '__lt': search_term + u'\uffff' } )
+
+class ScalableAdmin( admin.ModelAdmin ):
+	"""
+	A ModelAdmin whose change list counts in bounded time and searches a
+	single indexed column, 'search_prefix_field', by prefix. Only the first
+	COUNT_LIMIT matching rows are counted and paged; the rest can only be
+	reached through a filter or search, and actions on "all" rows are refused
+	while the count is capped, since they would reach rows never shown.
+	"""
+	paginator = CappedCountPaginator
+	change_list_template = 'admin/rango/change_list.html'
+	search_prefix_field = None
+
+	def get_changelist( self, request, **kwargs ):
+		return CappedCountChangeList
+
+	def get_search_results( self, request, queryset, search_term ):
+		return prefix_search( queryset, self.search_prefix_field, search_term ), False
+
+	def response_action( self, request, queryset ):
+		if request.POST.get( 'select_across' ) == '1' and capped_count( queryset ) >= COUNT_LIMIT:
+			self.message_user( request, 'At least %d rows are selected. Narrow the list with a '
+				'filter or search before acting on all of them.' % COUNT_LIMIT, messages.WARNING )
+			return None
+		return super( ScalableAdmin, self ).response_action( request, queryset )
+
+def update_in_batches( queryset, **values ):
+	"""
+	Applies 'values' to every row of 'queryset', BULK_BATCH_SIZE rows per
+	transaction, walking the primary keys in order. Returns the row count.
+	"""
+	updated = 0
+	last_pk = 0
+	while True:
+		batch = list( queryset.filter( pk__gt=last_pk ).order_by( 'pk' )
+			.values_list( 'pk', flat=True )[:BULK_BATCH_SIZE] )
+		if not batch:
+			return updated
+		with transaction.atomic():
+			updated += queryset.model._default_manager.filter( pk__in=batch ).update( **values )
+		last_pk = batch[-1]
+
 # Add in this class to customize the Admin Interface
 class CategoryAdmin( admin.ModelAdmin ):
 	prepopulated_fields = { 'slug':( 'name', ) }
 
+class PageViewsFilter( admin.SimpleListFilter ):
+	title = 'views'
+	parameter_name = 'views'
+
+	def lookups( self, request, model_admin ):
+		return ( ( 'none', 'Never viewed' ), ( 'some', 'Under 100' ), ( 'many', '100 or more' ) )
+
+	def queryset( self, request, queryset ):
+		if self.value() == 'none':
+			return queryset.filter( views=0 )
+		if self.value() == 'some':
+			return queryset.filter( views__gt=0, views__lt=100 )
+		if self.value() == 'many':
+			return queryset.filter( views__gte=100 )
+
+class RecategorizeForm( forms.Form ):
+	# A slug field rather than a select, which would list every category.
+	category = forms.SlugField( help_text='Slug of the category to move the pages to' )
+
+	def clean_category( self ):
+		try:
+			return Category.objects.get( slug=self.cleaned_data['category'] )
+		except Category.DoesNotExist:
+			raise forms.ValidationError( 'There is no category with that slug.' )
+
+class PageAdmin( ScalableAdmin ):
+	list_display = ( 'title', 'category', 'url', 'views' )
+	list_select_related = ( 'category', )
+	list_filter = ( PageViewsFilter, )
+	# search_fields only enables the search box; see ScalableAdmin.
+	search_fields = ( 'title', )
+	search_prefix_field = 'title'
+	raw_id_fields = ( 'category', )
+	actions = ( 'recategorize', 'reset_views' )
+
+	def recategorize( self, request, queryset ):
+		form = RecategorizeForm( request.POST if 'apply' in request.POST else None )
+		if form.is_valid():
+			count = update_in_batches( queryset, category=form.cleaned_data['category'] )
+			self.message_user( request, 'Moved %d pages to %s.' % ( count, form.cleaned_data['category'] ) )
+			return None
+		return render( request, 'admin/rango/page/recategorize.html', {
+			'form': form,
+			'queryset': queryset[:20],
+			'opts': self.model._meta,
+			'selected': request.POST.getlist( admin.ACTION_CHECKBOX_NAME ),
+			'select_across': request.POST.get( 'select_across', '0' ),
+			'action': 'recategorize',
+		} )
+	recategorize.short_description = 'Move selected pages to another category'
+
+	def reset_views( self, request, queryset ):
+		count = update_in_batches( queryset, views=0 )
+		self.message_user( request, 'Reset the views of %d pages.' % count )
+	reset_views.short_description = 'Reset views of selected pages'
+
+class UserProfileAdmin( ScalableAdmin ):
+	list_display = ( 'user', 'website' )
+	list_select_related = ( 'user', )
+	search_fields = ( 'user__username', )
+	search_prefix_field = 'user__username'
+	raw_id_fields = ( 'user', )
+
 # Register models so they show up in the admin tool
 admin.site.register( Category, CategoryAdmin )
-admin.site.register( Page )
-admin.site.register( UserProfile )
+admin.site.register( Page, PageAdmin )
+admin.site.register( UserProfile, UserProfileAdmin )
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RangoConfig(AppConfig):
+    name = 'rango'
+    verbose_name = 'Rango'
+
+    def ready(self):
+        # Importing these modules connects their signal receivers.
+        # pylint: disable=W0611
+        import rango.sitemaps
+        import rango.usercache
+        import rango.warmup
@@ -0,0 +1,32 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from rango.snapshot import SnapshotError, restore_snapshot
+
+
+class Command(BaseCommand):
+    args = '<snapshot> <target>'
+    help = ('Loads a snapshot taken with "manage.py snapshot" into a new '
+            'SQLite database at <target> and verifies it.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--pages', type='int', default=1000,
+                    help='Pages copied per step. Defaults to 1000.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError('Usage: manage.py restore_snapshot %s' % self.args)
+        snapshot, target = args
+        if options['pages'] < 1:
+            raise CommandError('--pages must be at least 1.')
+
+        try:
+            stats = restore_snapshot(snapshot, target, pages=options['pages'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('Restored %s to %s: %d pages (%.1f MB) in %.2fs, '
+                          '%.2f MB/s.' % (snapshot, target, stats.pages,
+                                          stats.bytes / 1e6, stats.elapsed,
+                                          stats.throughput / 1e6))
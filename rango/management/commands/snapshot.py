@@ -0,0 +1,54 @@
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rango.snapshot import SnapshotError, take_snapshot
+
+
+class Command(BaseCommand):
+    args = '<output>'
+    help = ('Copies the live SQLite database to <output> with the online '
+            'backup API, without blocking requests.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', default='default',
+                    help='Database alias to snapshot. Defaults to "default".'),
+        make_option('--pages', type='int', default=100,
+                    help='Pages copied per step. Defaults to 100.'),
+        make_option('--sleep', type='float', default=0.05,
+                    help='Seconds to yield between steps. Defaults to 0.05.'),
+        make_option('--compress', action='store_true', default=False,
+                    help='Gzip the snapshot.'),
+        make_option('--max-restarts', type='int', default=10,
+                    help='Give up once a rollback-journal database has made '
+                         'the copy restart this often. Defaults to 10.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Usage: manage.py snapshot %s' % self.args)
+        output = args[0]
+        if options['pages'] < 1:
+            raise CommandError('--pages must be at least 1.')
+        if options['compress'] and not output.endswith('.gz'):
+            output += '.gz'
+
+        database = settings.DATABASES[options['database']]
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Only SQLite databases can be snapshotted.')
+
+        try:
+            stats = take_snapshot(database['NAME'], output,
+                                  pages=options['pages'],
+                                  sleep=options['sleep'],
+                                  compress=options['compress'],
+                                  max_restarts=options['max_restarts'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('Wrote %s: %d pages (%.1f MB) in %.2fs, %.2f MB/s, '
+                          '%d steps, %d restarts, longest lock held %.1f ms.' % (
+                              output, stats.pages, stats.bytes / 1e6,
+                              stats.elapsed, stats.throughput / 1e6,
+                              stats.steps, stats.restarts,
+                              stats.longest_step * 1000))
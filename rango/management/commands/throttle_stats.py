@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from rango.throttle import rejected_counts
+
+
+class Command(NoArgsCommand):
+    help = 'Prints the number of requests rejected by each write throttle.'
+
+    def handle_noargs(self, **options):
+        scopes = sorted(getattr(settings, 'RANGO_THROTTLE_RATES', {}))
+        counts = rejected_counts(scopes)
+        for scope in scopes:
+            self.stdout.write('%-15s %8d rejected' % (scope, counts[scope]))
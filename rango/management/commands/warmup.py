@@ -0,0 +1,18 @@
+from django.core.management.base import NoArgsCommand
+from rango.warmup import warm_up, warm_up_notes
+
+
+class Command(NoArgsCommand):
+    help = ('Pre-imports views and forms, compiles URLs and templates, opens '
+            'the database and fills caches, reporting where the time goes.')
+
+    def handle_noargs(self, **options):
+        timings = warm_up()
+        for name, seconds in timings:
+            self.stdout.write('%-10s %8.1f ms' % (name, seconds * 1000))
+        self.stdout.write('%-10s %8.1f ms' % (
+            'total', sum(seconds for _, seconds in timings) * 1000))
+        self.stdout.write('Only the database file and shared caches outlive this '
+                          'command; wsgi.py warms each server process itself.')
+        for note in warm_up_notes():
+            self.stdout.write('Note: %s.' % note)
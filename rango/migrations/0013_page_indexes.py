@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0012_userprofile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='page',
+            name='title',
+            field=models.CharField(max_length=128, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='page',
+            name='views',
+            field=models.IntegerField(default=0, db_index=True),
+        ),
+    ]
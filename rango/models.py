@@ -19,9 +19,9 @@ class Category( models.Model ):
 
 class Page( models.Model ):
 	category = models.ForeignKey( Category )
-	title = models.CharField( max_length=128 )
+	title = models.CharField( max_length=128, db_index=True )
 	url = models.URLField()
-	views = models.IntegerField( default=0 )
+	views = models.IntegerField( default=0, db_index=True )
 
 	def __unicode__( self ):
 		return self.title
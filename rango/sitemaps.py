@@ -0,0 +1,158 @@
+"""
+'sitemaps.py' serves a sitemap index and the sitemap chunks it points to,
+so crawlers can find every category page through a few cached responses.
+
+Chunk N lists the categories whose primary key falls in
+((N - 1) * CHUNK_SIZE, N * CHUNK_SIZE]. Each chunk is rendered once and
+cached under a version stamp that is replaced whenever a category in its
+range is saved or deleted, so only that chunk is regenerated. Stamps and
+chunks live in the cache named by settings.RANGO_SITEMAP_CACHE, which must
+be shared by every worker process or the other workers keep serving stale
+chunks until CACHE_TIMEOUT.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.db.models import Max
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from rango.models import Category
+
+CHUNK_SIZE = getattr(settings, 'RANGO_SITEMAP_CHUNK_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'RANGO_SITEMAP_BATCH_SIZE', 1000)
+CACHE_TIMEOUT = getattr(settings, 'RANGO_SITEMAP_CACHE_TIMEOUT', 60 * 60 * 24)
+# Scheme and host the sitemaps advertise. Taken from settings rather than the
+# request, so a client cannot create new cache entries by varying Host.
+SITE_URL = getattr(settings, 'RANGO_SITE_URL', 'http://localhost:8000').rstrip('/')
+
+INDEX_VERSION_KEY = 'rango:sitemap:index:version'
+CHUNK_VERSION_KEY = 'rango:sitemap:chunk:%d:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'RANGO_SITEMAP_CACHE', 'default')]
+
+
+def _get_version(key):
+    """
+    Returns the version stamp stored under 'key', creating one if missing.
+    Stamps are random so an evicted stamp never revives stale content.
+    """
+    version = _cache().get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not _cache().add(key, version, None):
+            version = _cache().get(key, version)
+    return version
+
+
+def _bump_version(key):
+    _cache().set(key, uuid.uuid4().hex, None)
+
+
+def _chunk_for(pk):
+    return (pk - 1) // CHUNK_SIZE + 1
+
+
+def chunk_count():
+    """
+    Returns the number of sitemap chunks, cached until a category is
+    created or deleted.
+    """
+    key = 'rango:sitemap:count:%s' % _get_version(INDEX_VERSION_KEY)
+    count = _cache().get(key)
+    if count is None:
+        # pylint: disable=E1103
+        max_pk = Category.objects.aggregate(max_pk=Max('pk'))['max_pk']
+        # pylint: enable=E1103
+        count = _chunk_for(max_pk) if max_pk else 0
+        _cache().set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def _iter_category_slugs(lower, upper):
+    """
+    Yields the slugs of the categories with lower < pk <= upper in primary
+    key order, fetching BATCH_SIZE rows at a time with keyset pagination
+    so no query ever needs an OFFSET.
+    """
+    last_pk = lower
+    while True:
+        # pylint: disable=E1103
+        rows = list(Category.objects
+                    .filter(pk__gt=last_pk, pk__lte=upper)
+                    .order_by('pk')
+                    .values_list('pk', 'slug')[:BATCH_SIZE])
+        # pylint: enable=E1103
+        for _, slug in rows:
+            yield slug
+        if len(rows) < BATCH_SIZE:
+            return
+        last_pk = rows[-1][0]
+
+
+@cache_control(public=True, max_age=60 * 60)
+def sitemap_index(request):
+    """
+    Lists the URL of every sitemap chunk.
+    """
+    key = 'rango:sitemap:index:%s' % _get_version(INDEX_VERSION_KEY)
+    content = _cache().get(key)
+    if content is None:
+        sitemaps = [SITE_URL + reverse('sitemap_chunk', args=[section])
+                    for section in range(1, chunk_count() + 1)]
+        content = render_to_string('rango/sitemap_index.xml',
+                                   {'sitemaps': sitemaps})
+        _cache().set(key, content, CACHE_TIMEOUT)
+    return HttpResponse(content, content_type='application/xml')
+
+
+@cache_control(public=True, max_age=60 * 60)
+def sitemap_chunk(request, section):
+    """
+    Lists the category pages that belong to chunk 'section'.
+    """
+    section = int(section)
+    if section < 1 or section > chunk_count():
+        raise Http404('No sitemap chunk %d.' % section)
+
+    key = 'rango:sitemap:chunk:%d:%s' % (
+        section, _get_version(CHUNK_VERSION_KEY % section))
+    content = _cache().get(key)
+    if content is None:
+        lower = (section - 1) * CHUNK_SIZE
+        locations = (SITE_URL + reverse('category', args=[slug])
+                     for slug in _iter_category_slugs(lower, lower + CHUNK_SIZE))
+        content = render_to_string('rango/sitemap.xml',
+                                   {'locations': locations})
+        _cache().set(key, content, CACHE_TIMEOUT)
+    return HttpResponse(content, content_type='application/xml')
+
+
+# QuerySet.update() bypasses these signals; callers doing bulk updates should
+# call invalidate_sitemaps() themselves.
+@receiver(post_save, sender=Category)
+def _category_saved(sender, instance, created, **kwargs):
+    _bump_version(CHUNK_VERSION_KEY % _chunk_for(instance.pk))
+    if created:
+        _bump_version(INDEX_VERSION_KEY)
+
+
+@receiver(post_delete, sender=Category)
+def _category_deleted(sender, instance, **kwargs):
+    _bump_version(CHUNK_VERSION_KEY % _chunk_for(instance.pk))
+    _bump_version(INDEX_VERSION_KEY)
+
+
+def invalidate_sitemaps():
+    """
+    Forces the index and every chunk to be regenerated on next request.
+    """
+    for section in range(1, chunk_count() + 1):
+        _bump_version(CHUNK_VERSION_KEY % section)
+    _bump_version(INDEX_VERSION_KEY)
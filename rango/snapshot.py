@@ -0,0 +1,309 @@
+"""
+'snapshot.py' copies a live SQLite database with SQLite's online backup API,
+a bounded number of pages per step, and restores such copies into fresh
+databases. The source is only locked while a step runs and the copy pauses
+between steps, so requests keep being served while the copy is taken.
+
+Python 2's sqlite3 module does not expose the backup API, so it is called
+through ctypes from the SQLite library the sqlite3 module itself uses.
+"""
+import ctypes
+import ctypes.util
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+SQLITE_OK = 0
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+SQLITE_DONE = 101
+SQLITE_OPEN_READWRITE = 0x2
+SQLITE_OPEN_CREATE = 0x4
+
+_library = None
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class BackupStats(object):
+    """
+    Collects timings for one backup run. 'longest_step' is the longest time
+    a single step held the source database locked; 'restarts' counts how
+    often SQLite started the copy over because the source changed.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self.steps = 0
+        self.restarts = 0
+        self.longest_step = 0.0
+        self.elapsed = 0.0
+
+    def add_step(self, seconds):
+        self.steps += 1
+        self.longest_step = max(self.longest_step, seconds)
+
+    @property
+    def throughput(self):
+        """Copied bytes per second."""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+def _load_library():
+    """
+    Returns the SQLite C library, preferring the one the sqlite3 module is
+    built against.
+    """
+    global _library
+    if _library is None:
+        try:
+            import _sqlite3
+            library = ctypes.CDLL(_sqlite3.__file__)
+            library.sqlite3_backup_init
+        except (ImportError, AttributeError, OSError):
+            path = ctypes.util.find_library('sqlite3')
+            if path is None:
+                raise SnapshotError('Cannot find the SQLite library.')
+            library = ctypes.CDLL(path)
+
+        library.sqlite3_open_v2.argtypes = [ctypes.c_char_p,
+                                            ctypes.POINTER(ctypes.c_void_p),
+                                            ctypes.c_int, ctypes.c_char_p]
+        library.sqlite3_close.argtypes = [ctypes.c_void_p]
+        library.sqlite3_errmsg.argtypes = [ctypes.c_void_p]
+        library.sqlite3_errmsg.restype = ctypes.c_char_p
+        library.sqlite3_errstr.argtypes = [ctypes.c_int]
+        library.sqlite3_errstr.restype = ctypes.c_char_p
+        library.sqlite3_backup_init.argtypes = [ctypes.c_void_p, ctypes.c_char_p,
+                                                ctypes.c_void_p, ctypes.c_char_p]
+        library.sqlite3_backup_init.restype = ctypes.c_void_p
+        library.sqlite3_backup_step.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        library.sqlite3_backup_pagecount.argtypes = [ctypes.c_void_p]
+        library.sqlite3_backup_remaining.argtypes = [ctypes.c_void_p]
+        library.sqlite3_exec.argtypes = [ctypes.c_void_p, ctypes.c_char_p,
+                                         ctypes.c_void_p, ctypes.c_void_p,
+                                         ctypes.c_void_p]
+        library.sqlite3_backup_finish.argtypes = [ctypes.c_void_p]
+        _library = library
+    return _library
+
+
+def _error(library, db):
+    return library.sqlite3_errmsg(db).decode('utf-8', 'replace')
+
+
+def _describe(library, rc):
+    return library.sqlite3_errstr(rc).decode('utf-8', 'replace')
+
+
+def _open(library, path, flags):
+    if not isinstance(path, bytes):
+        path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+    db = ctypes.c_void_p()
+    rc = library.sqlite3_open_v2(path, ctypes.byref(db), flags, None)
+    if rc != SQLITE_OK:
+        message = _error(library, db) if db else 'out of memory'
+        library.sqlite3_close(db)
+        raise SnapshotError('Cannot open %s: %s' % (path, message))
+    return db
+
+
+def _execute(library, db, sql):
+    rc = library.sqlite3_exec(db, sql, None, None, None)
+    if rc != SQLITE_OK:
+        raise SnapshotError(_error(library, db))
+
+
+def _journal_mode(path):
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise SnapshotError('%s is not a usable database: %s' % (path, e))
+
+
+def _copy(library, source, target, pages, sleep, max_restarts, stats):
+    backup = library.sqlite3_backup_init(target, b'main', source, b'main')
+    if not backup:
+        raise SnapshotError(_error(library, target))
+    try:
+        remaining = None
+        while True:
+            started = time.time()
+            rc = library.sqlite3_backup_step(backup, pages)
+            stats.add_step(time.time() - started)
+            if rc == SQLITE_DONE:
+                break
+            if rc not in (SQLITE_OK, SQLITE_BUSY, SQLITE_LOCKED):
+                raise SnapshotError('Backup step failed: %s' % _describe(library, rc))
+            # SQLite starts over when another connection changes the source.
+            previous, remaining = remaining, library.sqlite3_backup_remaining(backup)
+            if previous is not None and remaining > previous:
+                stats.restarts += 1
+                if stats.restarts > max_restarts:
+                    raise SnapshotError('The database kept changing; the copy '
+                                        'restarted %d times.' % stats.restarts)
+            time.sleep(sleep)
+        stats.pages = library.sqlite3_backup_pagecount(backup)
+    finally:
+        rc = library.sqlite3_backup_finish(backup)
+    if rc != SQLITE_OK:
+        raise SnapshotError('Backup failed: %s' % _describe(library, rc))
+
+
+def backup(source_path, target_path, pages=100, sleep=0.05, max_restarts=10):
+    """
+    Copies 'source_path' to 'target_path', 'pages' pages per step, sleeping
+    'sleep' seconds between steps. Returns a BackupStats.
+
+    For a database in WAL mode a read transaction is held on the source for
+    the whole copy. Writers carry on, but the copy sees one consistent
+    version of the database and never has to restart. In other journal
+    modes holding it would block writers, so every step takes its own lock
+    and a change to the source restarts the copy; after 'max_restarts'
+    restarts SnapshotError is raised.
+    """
+    if pages < 1:
+        raise SnapshotError('Pages per step must be at least 1.')
+    if not os.path.exists(source_path):
+        raise SnapshotError('%s does not exist.' % source_path)
+    hold_read = _journal_mode(source_path) == 'wal'
+
+    library = _load_library()
+    stats = BackupStats()
+    started = time.time()
+    source = _open(library, source_path, SQLITE_OPEN_READWRITE)
+    try:
+        if hold_read:
+            _execute(library, source,
+                     b'BEGIN; SELECT count(*) FROM sqlite_master;')
+        target = _open(library, target_path,
+                       SQLITE_OPEN_READWRITE | SQLITE_OPEN_CREATE)
+        try:
+            _copy(library, source, target, pages, sleep, max_restarts, stats)
+        finally:
+            library.sqlite3_close(target)
+    finally:
+        if hold_read:
+            library.sqlite3_exec(source, b'ROLLBACK', None, None, None)
+        library.sqlite3_close(source)
+    stats.elapsed = time.time() - started
+    stats.bytes = os.path.getsize(target_path)
+    return stats
+
+
+def verify(path):
+    """
+    Raises SnapshotError unless 'path' is an intact SQLite database that
+    holds an applied Django schema.
+    """
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+            if result != 'ok':
+                raise SnapshotError('Integrity check of %s failed: %s' % (path, result))
+            tables = conn.execute("SELECT count(*) FROM sqlite_master "
+                                  "WHERE type='table' AND name='django_migrations'")
+            if not tables.fetchone()[0]:
+                raise SnapshotError('%s holds no Django schema.' % path)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise SnapshotError('%s is not a usable database: %s' % (path, e))
+
+
+def _temporary_path(near, suffix='.sqlite3'):
+    handle, path = tempfile.mkstemp(suffix=suffix,
+                                    dir=os.path.dirname(os.path.abspath(near)))
+    os.close(handle)
+    return path
+
+
+def _remove(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _gzip(source_path, target_path):
+    with open(source_path, 'rb') as raw:
+        compressed = gzip.open(target_path, 'wb')
+        try:
+            shutil.copyfileobj(raw, compressed)
+        finally:
+            compressed.close()
+
+
+def _gunzip(source_path, target_path):
+    compressed = gzip.open(source_path, 'rb')
+    try:
+        with open(target_path, 'wb') as raw:
+            shutil.copyfileobj(compressed, raw)
+    finally:
+        compressed.close()
+
+
+def take_snapshot(source_path, output_path, pages=100, sleep=0.05,
+                  compress=False, max_restarts=10):
+    """
+    Backs 'source_path' up to 'output_path', gzipping the result if
+    'compress' is set. The copy is verified and written to a temporary file
+    first, then renamed into place, so a failure never leaves a partial
+    snapshot behind. Returns the BackupStats of the copy.
+    """
+    work_path = _temporary_path(output_path)
+    gzip_path = None
+    try:
+        stats = backup(source_path, work_path, pages, sleep, max_restarts)
+        verify(work_path)
+        if compress:
+            gzip_path = _temporary_path(output_path, '.gz')
+            _gzip(work_path, gzip_path)
+            os.rename(gzip_path, output_path)
+        else:
+            os.rename(work_path, output_path)
+    except (IOError, OSError) as e:
+        raise SnapshotError('Cannot write %s: %s' % (output_path, e))
+    finally:
+        _remove(work_path, gzip_path)
+    return stats
+
+
+def restore_snapshot(snapshot_path, target_path, pages=1000):
+    """
+    Loads the (optionally gzipped) snapshot at 'snapshot_path' into a new
+    database at 'target_path' and verifies it. On any failure the target is
+    removed again. Returns the BackupStats.
+    """
+    if os.path.exists(target_path):
+        raise SnapshotError('%s already exists.' % target_path)
+
+    work_path = None
+    source_path = snapshot_path
+    try:
+        if snapshot_path.endswith('.gz'):
+            work_path = source_path = _temporary_path(target_path)
+            _gunzip(snapshot_path, work_path)
+        # Nothing else reads the target yet, so copy without pausing.
+        stats = backup(source_path, target_path, pages, sleep=0)
+        verify(target_path)
+    except (IOError, OSError) as e:
+        _remove(target_path)
+        raise SnapshotError('Cannot restore %s: %s' % (snapshot_path, e))
+    except Exception:
+        _remove(target_path)
+        raise
+    finally:
+        _remove(work_path)
+    return stats
@@ -1,3 +1,282 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from rango import admin as rango_admin
+from rango.models import Category, Page, UserProfile
+from rango.snapshot import SnapshotError, restore_snapshot, take_snapshot
+from rango.throttle import rejected_counts, throttle
+from rango.usercache import USER_KEY, get_user_profile
+
+# Tests must not depend on a memcached server or leave files behind.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'rango-test-default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+               'LOCATION': 'rango-test-shared'},
+    'sitemaps': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                 'LOCATION': 'rango-test-sitemaps'},
+}
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SitemapTests(CacheTestCase):
+    def test_chunk_lists_categories(self):
+        Category.objects.create(name='Python')
+        response = self.client.get(reverse('sitemap_chunk', args=[1]))
+        self.assertContains(response, '/rango/category/python/')
+
+    def test_chunk_regenerated_when_category_changes(self):
+        category = Category.objects.create(name='Python')
+        self.client.get(reverse('sitemap_chunk', args=[1]))
+        category.name = 'Django'
+        category.save()
+        response = self.client.get(reverse('sitemap_chunk', args=[1]))
+        self.assertContains(response, '/rango/category/django/')
+        self.assertNotContains(response, '/rango/category/python/')
+
+    def test_host_header_does_not_change_output(self):
+        Category.objects.create(name='Python')
+        response = self.client.get(reverse('sitemap_index'),
+                                   HTTP_HOST='evil.example.com')
+        self.assertNotContains(response, 'evil.example.com')
+
+    def test_missing_chunk(self):
+        response = self.client.get(reverse('sitemap_chunk', args=[2]))
+        self.assertEqual(response.status_code, 404)
+
+
+def _throttled_view(request):
+    return HttpResponse('ok')
+
+
+@override_settings(CACHES=TEST_CACHES, RANGO_THROTTLE_CACHE='shared',
+                   RANGO_THROTTLE_RATES={})
+class ThrottleTests(CacheTestCase):
+    def setUp(self):
+        super(ThrottleTests, self).setUp()
+        self.view = throttle('test', '2/m')(_throttled_view)
+        self.factory = RequestFactory()
+
+    def post(self, address='10.0.0.1', user=None):
+        request = self.factory.post('/', REMOTE_ADDR=address)
+        request.user = user or AnonymousUser()
+        return self.view(request)
+
+    def test_rejects_once_bucket_is_empty(self):
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 200)
+        response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertEqual(self.post('10.0.0.2').status_code, 200)
+
+    def test_safe_methods_are_not_throttled(self):
+        for _ in range(5):
+            request = self.factory.get('/')
+            request.user = AnonymousUser()
+            self.assertEqual(self.view(request).status_code, 200)
+
+    def test_rejections_are_counted(self):
+        for _ in range(4):
+            self.post()
+        self.assertEqual(rejected_counts(['test']), {'test': 2})
+
+    def test_rejection_does_not_charge_other_buckets(self):
+        user = User.objects.create_user('bob', password='secret')
+        self.post('10.0.0.1')
+        self.post('10.0.0.1')
+        # The IP bucket is empty, so the user's bucket must stay full.
+        self.assertEqual(self.post('10.0.0.1', user).status_code, 429)
+        self.assertEqual(self.post('10.0.0.2', user).status_code, 200)
+        self.assertEqual(self.post('10.0.0.3', user).status_code, 200)
+        self.assertEqual(self.post('10.0.0.4', user).status_code, 429)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = self.path('source.sqlite3')
+        conn = sqlite3.connect(self.source)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE django_migrations (id integer PRIMARY KEY, name text)')
+        conn.executemany('INSERT INTO django_migrations (name) VALUES (?)',
+                         [('migration %d' % i,) for i in range(2000)])
+        conn.commit()
+        conn.close()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def rows(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT count(*) FROM django_migrations').fetchone()[0]
+        finally:
+            conn.close()
+
+    def round_trip(self, output, compress):
+        stats = take_snapshot(self.source, output, pages=5, sleep=0,
+                              compress=compress)
+        self.assertTrue(stats.steps > 1)
+        self.assertEqual(stats.restarts, 0)
+        restore_snapshot(output, self.path('restored.sqlite3'))
+        self.assertEqual(self.rows(self.path('restored.sqlite3')), 2000)
+
+    def test_round_trip(self):
+        self.round_trip(self.path('snapshot.sqlite3'), compress=False)
+
+    def test_compressed_round_trip(self):
+        self.round_trip(self.path('snapshot.sqlite3.gz'), compress=True)
+        with gzip.open(self.path('snapshot.sqlite3.gz'), 'rb') as snapshot:
+            self.assertTrue(snapshot.read(16).startswith(b'SQLite format 3'))
+
+    def test_restore_removes_target_on_failure(self):
+        with open(self.path('junk'), 'wb') as junk:
+            junk.write(b'not a database' * 1000)
+        target = self.path('restored.sqlite3')
+        self.assertRaises(SnapshotError, restore_snapshot, self.path('junk'), target)
+        self.assertFalse(os.path.exists(target))
+        # A retry must not fail because of a leftover target.
+        take_snapshot(self.source, self.path('snapshot.sqlite3'))
+        restore_snapshot(self.path('snapshot.sqlite3'), target)
+
+    def test_restore_refuses_existing_target(self):
+        take_snapshot(self.source, self.path('snapshot.sqlite3'))
+        self.assertRaises(SnapshotError, restore_snapshot,
+                          self.path('snapshot.sqlite3'), self.source)
+
+    def test_pages_must_be_positive(self):
+        self.assertRaises(SnapshotError, take_snapshot, self.source,
+                          self.path('snapshot.sqlite3'), pages=0)
+        self.assertFalse(os.path.exists(self.path('snapshot.sqlite3')))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PageAdminTests(CacheTestCase):
+    def setUp(self):
+        super(PageAdminTests, self).setUp()
+        User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.login(username='admin', password='secret')
+        category = Category.objects.create(name='Python')
+        for i in range(5):
+            Page.objects.create(category=category, title='Page %d' % i,
+                                url='http://example.com/%d' % i, views=10)
+        self.url = reverse('admin:rango_page_changelist')
+        self.addCleanup(setattr, rango_admin, 'COUNT_LIMIT', rango_admin.COUNT_LIMIT)
+        rango_admin.COUNT_LIMIT = 3
+
+    def reset_views(self, select_across):
+        return self.client.post(self.url, {
+            'action': 'reset_views',
+            'index': 0,
+            'select_across': select_across,
+            '_selected_action': [page.pk for page in Page.objects.all()[:2]],
+        })
+
+    def test_count_is_capped(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertTrue(response.context['cl'].count_capped)
+        self.assertContains(response, 'Use a filter or search to reach the rest')
+
+    def test_select_across_refused_when_capped(self):
+        self.reset_views('1')
+        self.assertEqual(Page.objects.filter(views=0).count(), 0)
+
+    def test_selected_rows_still_act(self):
+        self.reset_views('0')
+        self.assertEqual(Page.objects.filter(views=0).count(), 2)
+
+    def test_search_uses_prefix(self):
+        response = self.client.get(self.url, {'q': 'Page 1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_recategorize(self):
+        Category.objects.create(name='Django')
+        pages = [page.pk for page in Page.objects.all()[:2]]
+        data = {'action': 'recategorize', 'select_across': '0',
+                '_selected_action': pages}
+        response = self.client.post(self.url, dict(data, index=0))
+        self.assertContains(response, 'Move pages')
+        self.client.post(self.url, dict(data, apply='1', category='django'))
+        self.assertEqual(Page.objects.filter(category__slug='django').count(), 2)
+
+
+@override_settings(CACHES=TEST_CACHES, RANGO_USER_CACHE='shared')
+class UserCacheTests(CacheTestCase):
+    def setUp(self):
+        super(UserCacheTests, self).setUp()
+        self.user = User.objects.create_user('bob', password='secret')
+        self.client.login(username='bob', password='secret')
+        self.backend = self.client.session[BACKEND_SESSION_KEY]
+
+    def cached_user(self):
+        return caches['shared'].get(USER_KEY % (self.backend, self.user.pk))
+
+    def logged_in(self):
+        response = self.client.get(reverse('about'))
+        return response.context['user'].is_authenticated()
+
+    def test_steady_state_runs_no_queries(self):
+        self.assertTrue(self.logged_in())
+        with self.assertNumQueries(0):
+            self.assertTrue(self.logged_in())
+
+    def test_password_change_drops_cached_user(self):
+        self.assertTrue(self.logged_in())
+        self.assertNotEqual(self.cached_user(), None)
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.cached_user(), None)
+        self.assertFalse(self.logged_in())
+
+    def test_logout_drops_cached_user(self):
+        self.assertTrue(self.logged_in())
+        self.client.get(reverse('auth_logout'))
+        self.assertEqual(self.cached_user(), None)
+        self.assertFalse(self.logged_in())
+
+    def test_session_with_wrong_hash_is_flushed(self):
+        self.assertTrue(self.logged_in())
+        session = self.client.session
+        session[HASH_SESSION_KEY] = 'not the hash'
+        session.save()
+        self.assertFalse(self.logged_in())
+        self.assertFalse(SESSION_KEY in self.client.session)
+
+    def test_stale_cached_user_is_refreshed(self):
+        self.assertTrue(self.logged_in())
+        stale = User.objects.get(pk=self.user.pk)
+        stale.set_password('old')
+        caches['shared'].set(USER_KEY % (self.backend, self.user.pk), stale)
+        self.assertTrue(self.logged_in())
+
+    def test_profile_served_from_cache_and_invalidated(self):
+        self.assertEqual(get_user_profile(self.user), None)
+        profile = UserProfile.objects.create(user=self.user,
+                                             website='http://example.com/')
+        self.assertEqual(get_user_profile(self.user), profile)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_profile(self.user).website,
+                             'http://example.com/')
+        profile.website = 'http://example.org/'
+        profile.save()
+        self.assertEqual(get_user_profile(self.user).website,
+                         'http://example.org/')
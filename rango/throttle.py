@@ -0,0 +1,138 @@
+"""
+'throttle.py' provides token-bucket rate limiting for the views that write
+to the database, so one noisy client cannot hold the SQLite write lock and
+starve every reader.
+
+Buckets live in a cache backend, never in the database, and each decision
+costs a fixed number of cache operations. Limits are read from
+settings.RANGO_THROTTLE_RATES, keyed by scope, e.g.
+
+    RANGO_THROTTLE_RATES = {'add_category': '10/m'}
+
+A rate is 'count/period' where period is one of s, m, h or d. A client may
+burst up to 'count' requests, after which tokens refill evenly over
+'period'. Bucket updates are not atomic across processes, so under heavy
+contention a client may occasionally slip an extra request through.
+Every rejected request is counted per scope in the same cache, see
+rejected_counts() and 'manage.py throttle_stats', and logged as a warning on
+the 'rango.throttle' logger.
+"""
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+REJECTED_KEY = 'rango:throttle:rejected:%s'
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[getattr(settings, 'RANGO_THROTTLE_CACHE', 'default')]
+
+
+def parse_rate(rate):
+    """
+    Turns a 'count/period' string into (capacity, tokens per second).
+    """
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, float(capacity) / PERIODS[period[0].lower()]
+
+
+def get_rate(scope, default):
+    return getattr(settings, 'RANGO_THROTTLE_RATES', {}).get(scope, default)
+
+
+def _available(key, capacity, refill, now):
+    """
+    Returns the tokens in the bucket stored under 'key' at time 'now'.
+    """
+    tokens, stamp = _cache().get(key, (capacity, now))
+    return min(capacity, tokens + (now - stamp) * refill)
+
+
+def _count_rejection(scope):
+    store = _cache()
+    key = REJECTED_KEY % scope
+    try:
+        store.incr(key)
+    except ValueError:
+        # No counter yet, or the cache is unreachable.
+        if not store.add(key, 1, None):
+            try:
+                store.incr(key)
+            except ValueError:
+                pass
+
+
+def rejected_counts(scopes):
+    """
+    Returns a dictionary with the number of rejected requests per scope.
+    """
+    counts = _cache().get_many([REJECTED_KEY % scope for scope in scopes])
+    return dict((scope, counts.get(REJECTED_KEY % scope, 0))
+                for scope in scopes)
+
+
+def client_keys(request, scope):
+    """
+    Returns the bucket keys charged for 'request': one for the client IP and,
+    for logged in users, one for the user.
+    """
+    keys = ['rango:throttle:%s:ip:%s' % (scope, request.META.get('REMOTE_ADDR'))]
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated():
+        keys.append('rango:throttle:%s:user:%s' % (scope, user.pk))
+    return keys
+
+
+def check(request, scope, rate):
+    """
+    Returns 0 and takes a token from every bucket 'request' belongs to if
+    all of them have one, otherwise leaves the buckets untouched and returns
+    the number of seconds the client should wait.
+    """
+    capacity, refill = parse_rate(rate)
+    now = time.time()
+    buckets = [(key, _available(key, capacity, refill, now))
+               for key in client_keys(request, scope)]
+    wait = max((1 - tokens) / refill for _, tokens in buckets)
+    if wait > 0:
+        _count_rejection(scope)
+        logger.warning('Throttled %s request from %s (%s), retry in %.1fs.',
+                       scope, request.META.get('REMOTE_ADDR'),
+                       getattr(request, 'user', 'unknown user'), wait)
+        return wait
+
+    store = _cache()
+    timeout = int(capacity / refill) + 1
+    for key, tokens in buckets:
+        store.set(key, (tokens - 1, now), timeout)
+    return 0
+
+
+def throttle(scope, rate='30/m'):
+    """
+    Decorates a view so that its write requests are limited to 'rate' per
+    client. settings.RANGO_THROTTLE_RATES[scope] overrides 'rate'. Safe
+    methods are never throttled; rejected requests get a 429 response.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                wait = check(request, scope, get_rate(scope, rate))
+                if wait:
+                    response = HttpResponse('Too many requests, please slow down.',
+                                            content_type='text/plain', status=429)
+                    response['Retry-After'] = str(int(wait) + 1)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
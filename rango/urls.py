@@ -1,5 +1,5 @@
 from django.conf.urls import patterns, url
-from rango import views
+from rango import views, sitemaps
 
 urlpatterns = patterns('', 
 		url(r'^$', views.index, name='index'),
@@ -10,4 +10,7 @@ urlpatterns = patterns('',
 		url(r'^category/(?P<category_name_slug>[\w\-]+)/add_page/$', 
                views.add_page, name='add_page'),
         url(r'^restricted/$', views.restricted, name='restricted'),
+        url(r'^sitemap\.xml$', sitemaps.sitemap_index, name='sitemap_index'),
+        url(r'^sitemap-(?P<section>\d+)\.xml$', sitemaps.sitemap_chunk,
+            name='sitemap_chunk'),
 )
@@ -0,0 +1,134 @@
+"""
+'usercache.py' keeps recently seen users and their profiles in a
+short-lived cache so that authenticated requests do not query auth_user or
+rango_userprofile on every page view.
+
+CachedAuthenticationMiddleware replaces Django's AuthenticationMiddleware.
+Users are cached by id in the cache named by settings.RANGO_USER_CACHE, which
+must be shared by every worker process: entries are deleted when a user or
+profile is saved or deleted or the user logs out, and every process has to
+see that at once for password, is_active and is_staff changes to take
+effect everywhere. Every
+request still checks its session's auth hash against the cached user, so
+sessions are verified exactly as SessionAuthenticationMiddleware would.
+"""
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from rango.models import UserProfile
+
+USER_KEY = 'rango:auth:user:%s:%s'
+PROFILE_KEY = 'rango:auth:profile:%s'
+
+
+def _cache():
+    return caches[getattr(settings, 'RANGO_USER_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'RANGO_USER_CACHE_TIMEOUT', 60)
+
+
+def _load_user(user_id, backend_path, refresh=False):
+    key = USER_KEY % (backend_path, user_id)
+    user = None if refresh else _cache().get(key)
+    if user is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is not None:
+            user.backend = backend_path
+            _cache().set(key, user, _timeout())
+    return user
+
+
+def get_user(request):
+    """
+    Returns the user logged in to 'request', served from the cache when
+    possible, or an AnonymousUser.
+    """
+    try:
+        user_id = request.session[SESSION_KEY]
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    user = _load_user(user_id, backend_path)
+    if user is not None and not _hash_matches(user, session_hash):
+        # The cached copy may predate a change not yet invalidated.
+        user = _load_user(user_id, backend_path, refresh=True)
+        if user is not None and not _hash_matches(user, session_hash):
+            request.session.flush()
+            user = None
+    return user or AnonymousUser()
+
+
+def _hash_matches(user, session_hash):
+    if not hasattr(user, 'get_session_auth_hash'):
+        return True
+    return bool(session_hash and
+                constant_time_compare(session_hash, user.get_session_auth_hash()))
+
+
+def get_user_profile(user):
+    """
+    Returns the UserProfile of 'user', or None if it has none.
+    """
+    if not user.is_authenticated():
+        return None
+    key = PROFILE_KEY % user.pk
+    # Wrapped in a tuple so that a missing profile is cached too.
+    cached = _cache().get(key)
+    if cached is None:
+        # pylint: disable=E1103
+        cached = (UserProfile.objects.filter(user_id=user.pk).first(),)
+        # pylint: enable=E1103
+        _cache().set(key, cached, _timeout())
+    return cached[0]
+
+
+def invalidate_user(user_id):
+    _cache().delete_many([USER_KEY % (backend, user_id)
+                          for backend in settings.AUTHENTICATION_BACKENDS] +
+                         [PROFILE_KEY % user_id])
+
+
+class CachedAuthenticationMiddleware(object):
+    """
+    Drop-in replacement for AuthenticationMiddleware that loads request.user
+    through the user cache.
+    """
+
+    def process_request(self, request):
+        assert hasattr(request, 'session'), (
+            "The authentication middleware requires session middleware to be "
+            "installed. Edit your MIDDLEWARE_CLASSES setting to insert "
+            "'django.contrib.sessions.middleware.SessionMiddleware' before "
+            "'rango.usercache.CachedAuthenticationMiddleware'.")
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def _profile_changed(sender, instance, **kwargs):
+    _cache().delete(PROFILE_KEY % instance.user_id)
+
+
+@receiver(user_logged_out)
+def _user_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -6,6 +6,7 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from rango.models import Category, Page
 from rango.forms import CategoryForm, PageForm
+from rango.throttle import throttle
 from datetime import datetime
 
 def index(request):
@@ -87,6 +88,7 @@ def category(request, category_name_slug):
     return render(request, 'rango/category.html', context_dict)
 
 @login_required
+@throttle('add_category', '10/m')
 def add_category(request):
     """
     User must be logged in to use this functionality.
@@ -121,6 +123,7 @@ def add_category(request):
     return render(request, 'rango/add_category.html', {'form': form})
 
 @login_required
+@throttle('add_page', '30/m')
 def add_page(request, category_name_slug):
     """
     User must be logged in to use this functionality.
@@ -0,0 +1,175 @@
+"""
+'warmup.py' pays the one-off start-up costs of a worker (imports, URL
+resolver compilation, template loading, database checks and cache filling)
+before it accepts traffic, instead of on the first requests.
+
+The database connection is closed when warm-up ends, since a preforking
+server must not share it between workers, so SQLite's own page cache does
+not survive. What does survive is the state of the process (imports, URLs,
+compiled templates), anything written to shared caches, the journal mode
+set on the database file and the operating system's cache of the file.
+Compiled templates are only kept when the cached template loader is on,
+which settings.py does outside DEBUG. warm_up_notes() lists which of these
+caveats apply to the current settings.
+
+It also tunes every new SQLite connection with settings.RANGO_SQLITE_PRAGMAS,
+which should only hold per-connection pragmas: with CONN_MAX_AGE at 0 they
+run on every request.
+"""
+import importlib
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+MODULES = (
+    'rango.views',
+    'rango.forms',
+    'rango.sitemaps',
+    'registration.forms',
+    'registration.backends.simple.views',
+    'django.contrib.auth.views',
+    'django.contrib.auth.forms',
+)
+
+URL_NAMES = ('index', 'about', 'add_category', 'restricted',
+             'registration_register', 'auth_login', 'auth_logout')
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.cursor()
+    for pragma in getattr(settings, 'RANGO_SQLITE_PRAGMAS', ()):
+        cursor.execute('PRAGMA %s' % pragma)
+
+
+def import_modules():
+    for name in MODULES:
+        importlib.import_module(name)
+
+
+def compile_urls():
+    from django.core.urlresolvers import get_resolver, resolve, reverse
+    get_resolver(None)
+    for name in URL_NAMES:
+        resolve(reverse(name))
+
+
+def load_templates():
+    """
+    Loads every template under TEMPLATE_DIRS. With the cached template loader
+    the compiled templates are kept for the life of the process.
+    """
+    from django.template.loader import get_template
+    for directory in settings.TEMPLATE_DIRS:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.xml', '.txt')):
+                    get_template(os.path.relpath(os.path.join(root, filename),
+                                                 directory))
+
+
+def open_database():
+    """
+    Opens a connection, which checks the database is reachable, and sets
+    settings.RANGO_SQLITE_JOURNAL_MODE. The journal mode is stored in the
+    database file, so it only needs setting once rather than per connection.
+    """
+    connection.ensure_connection()
+    journal_mode = getattr(settings, 'RANGO_SQLITE_JOURNAL_MODE', None)
+    if journal_mode and connection.vendor == 'sqlite':
+        connection.cursor().execute('PRAGMA journal_mode=%s' % journal_mode)
+
+
+def load_auth():
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import get_hasher
+    get_user_model()
+    get_hasher()
+
+
+def fill_caches():
+    """
+    Fills the sitemap chunk count in the shared sitemap cache, and runs the
+    index leaderboard queries and the slug lookups for the top categories so
+    the parts of the database file they read are in the operating system's
+    file cache.
+    """
+    from rango.models import Category, Page
+    from rango.sitemaps import chunk_count
+    # pylint: disable=E1103
+    for slug in Category.objects.order_by('-likes').values_list('slug', flat=True)[:5]:
+        Category.objects.get(slug=slug)
+    list(Page.objects.order_by('-views')[:5])
+    # pylint: enable=E1103
+    chunk_count()
+
+
+STEPS = (
+    ('imports', import_modules),
+    ('urls', compile_urls),
+    ('templates', load_templates),
+    ('database', open_database),
+    ('auth', load_auth),
+    ('caches', fill_caches),
+)
+
+
+def _uses_cached_loader():
+    for loader in settings.TEMPLATE_LOADERS:
+        if isinstance(loader, (list, tuple)):
+            loader = loader[0]
+        if loader == 'django.template.loaders.cached.Loader':
+            return True
+    return False
+
+
+def warm_up_notes():
+    """
+    Returns the warm-up effects that do not last under the current settings.
+    """
+    notes = []
+    if not _uses_cached_loader():
+        notes.append('templates: compiled templates are not kept, the cached '
+                     'template loader is off (it is only on when DEBUG is off)')
+    max_age = connection.settings_dict.get('CONN_MAX_AGE', 0)
+    if max_age:
+        notes.append('database: the warm-up connection is closed; each worker '
+                     'opens its own and reuses it for %s seconds' % max_age)
+    else:
+        notes.append('database: the warm-up connection is closed and, with '
+                     'CONN_MAX_AGE at 0, every request opens a new one')
+    return notes
+
+
+def warm_up(keep_connection=False):
+    """
+    Runs every warm-up step and returns a list of (step, seconds) pairs.
+    The database connection is closed afterwards unless 'keep_connection'
+    is set, so a preforking server never shares it between workers.
+    """
+    timings = []
+    try:
+        for name, step in STEPS:
+            started = time.time()
+            step()
+            timings.append((name, time.time() - started))
+    finally:
+        if not keep_connection:
+            connection.close()
+
+    logger.info('Warm-up took %.1f ms (%s).',
+                sum(seconds for _, seconds in timings) * 1000,
+                ', '.join('%s %.1f ms' % (name, seconds * 1000)
+                          for name, seconds in timings))
+    for note in warm_up_notes():
+        logger.info('Warm-up note: %s.', note)
+    return timings
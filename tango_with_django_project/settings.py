@@ -38,6 +38,16 @@ TEMPLATE_DIRS = [
 
 TEMPLATE_DEBUG = True
 
+# Outside development, keep compiled templates for the life of the process.
+TEMPLATE_LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+if not DEBUG:
+    TEMPLATE_LOADERS = (
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    )
+
 ALLOWED_HOSTS = []
 
 
@@ -58,7 +68,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'rango.usercache.CachedAuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -76,9 +86,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Reuse a connection for a minute instead of opening one per request.
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Set once by the warm-up; it is stored in the database file. WAL lets readers
+# carry on while a write is in progress.
+RANGO_SQLITE_JOURNAL_MODE = 'WAL'
+
+# Applied to every new SQLite connection.
+RANGO_SQLITE_PRAGMAS = (
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+)
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
 
@@ -106,3 +128,91 @@ STATICFILES_DIRS = (
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# Cache configuration
+# https://docs.djangoproject.com/en/1.7/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rango',
+    },
+    # Shared by every worker process, for small entries another process must
+    # see as soon as they change. Needs a memcached server and the
+    # python-memcached package; if the server is down every read misses and
+    # every write is dropped, so the site keeps working without the caching.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+    # Sitemap chunks, which can exceed memcached's 1 MB item limit, and their
+    # version stamps. Django's file cache lists its whole directory on every
+    # write and deletes a random third of the entries once MAX_ENTRIES is
+    # reached, so it is kept apart from other data. Writes only happen when a
+    # category changes or a chunk is regenerated, and a culled stamp is simply
+    # replaced, causing one extra regeneration.
+    'sitemaps': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sitemaps'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+# Sessions are read from the shared cache and written through to the database,
+# so a logout in one worker is seen by all of them.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
+# Logged in users and their profiles, cached for CachedAuthenticationMiddleware.
+# The cache must be shared by all workers so that invalidation reaches every
+# process.
+RANGO_USER_CACHE = 'shared'
+RANGO_USER_CACHE_TIMEOUT = 5 * 60
+
+
+# Sitemaps: the site URL they advertise, categories per chunk, rows fetched per
+# query, the cache holding the chunks and their version stamps (must be shared
+# by all workers), and its lifetime.
+
+RANGO_SITE_URL = 'http://localhost:8000'
+RANGO_SITEMAP_CACHE = 'sitemaps'
+RANGO_SITEMAP_CHUNK_SIZE = 10000
+RANGO_SITEMAP_BATCH_SIZE = 1000
+RANGO_SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Write throttling: per-client token buckets for each throttled view, and the
+# per-scope rejection counters, kept in the cache named by RANGO_THROTTLE_CACHE.
+# It must be shared by all worker processes, or each worker allows the full
+# rate on its own.
+
+RANGO_THROTTLE_CACHE = 'shared'
+RANGO_THROTTLE_RATES = {
+    'add_category': '10/m',
+    'add_page': '30/m',
+    'register': '5/h',
+}
+
+
+# Logging: send rango's own messages (throttled requests, warm-up timings) to
+# the console alongside Django's defaults.
+# https://docs.djangoproject.com/en/1.7/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'rango': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
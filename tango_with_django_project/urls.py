@@ -2,6 +2,7 @@ from django.conf.urls import patterns, include, url
 from django.contrib import admin
 from django.conf import settings
 from registration.backends.simple.views import RegistrationView
+from rango.throttle import throttle
 
 # Create a new class that redirects the user to the index page, if successful
 # at login
@@ -17,7 +18,7 @@ urlpatterns = patterns('',
 
     url(r'^admin/', include(admin.site.urls)),
     url(r'^rango/', include('rango.urls')),
-    url(r'^accounts/register/$', MyRegistrationView.as_view(), 
+    url(r'^accounts/register/$', throttle('register', '5/h')(MyRegistrationView.as_view()),
         name='registration_register'),
     url(r'^accounts/', include('registration.backends.simple.urls')),
 )
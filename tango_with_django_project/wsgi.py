@@ -12,3 +12,14 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tango_with_django_project.setti
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+# Pay start-up costs now rather than on the first requests. With a preforking
+# server that loads the application before forking, this runs once and every
+# worker inherits the warmed state. Warm-up is only an optimisation, so a
+# failure is logged and never stops the application from loading.
+import logging
+try:
+    from rango.warmup import warm_up
+    warm_up()
+except Exception:
+    logging.getLogger('rango.warmup').exception('Warm-up failed, starting cold.')